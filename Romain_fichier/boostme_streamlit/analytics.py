@@ -0,0 +1,86 @@
+"""
+Slicer filtering and KPI aggregation over a prepared dataset.
+
+Plain pandas/NumPy functions; app.py wraps them in Streamlit caches. Kept
+out of app.py so they can be imported and tested on their own.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset import FILTER_COLUMNS, WEEKDAYS
+from kpi_kernels import kpi4
+
+# Columns behind the 4 KPI cards
+KPI_COLUMNS = ["category_id", "views", "Taux d'engagement (%)", "Engagement total"]
+
+def isin_mask(s: pd.Series, sel) -> np.ndarray:
+    """
+    isin() for one slicer column. Categoricals translate the selection to
+    codes once, then gather from a per-category lookup table (no hashing per row).
+    """
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.isin(sel).to_numpy(dtype=bool)
+    categories = s.cat.categories
+    selected = categories.get_indexer(list(sel))
+    # One extra False slot: missing values have code -1
+    lookup = np.zeros(len(categories) + 1, dtype=bool)
+    lookup[selected[selected >= 0]] = True
+    return lookup[s.cat.codes.to_numpy()]
+
+def filter_mask(df: pd.DataFrame, filters: tuple) -> np.ndarray | None:
+    """Combined boolean mask for the slicer selections (None = no active filter)."""
+    mask = None
+    for col, sel in zip(FILTER_COLUMNS, filters):
+        if not sel or col not in df.columns:
+            continue
+        col_mask = isin_mask(df[col], sel)
+        if mask is None:
+            mask = col_mask
+        else:
+            # AND in place: one N-sized buffer instead of stacking all masks
+            mask &= col_mask
+    return mask
+
+def native_values(s: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Column values at their own (narrow) dtype, missing filled with 0, plus a validity mask."""
+    dtype = getattr(s.dtype, "numpy_dtype", s.dtype)
+    if dtype.kind not in "biuf":
+        dtype = np.dtype(np.float64)
+    values = s.to_numpy(dtype=dtype, na_value=0)
+    valid = s.notna().to_numpy(dtype=bool)
+    if dtype.kind == "f":
+        # Arrow-backed floats can hold a (non-null) NaN, which notna() keeps: blank in PBIX too
+        valid = valid & ~np.isnan(values)
+    return values, valid
+
+def kpis(sub: pd.DataFrame) -> dict:
+    """The 4 PBIX KPIs in one pass over the KPI_COLUMNS of already filtered rows."""
+    has_cat = sub["category_id"].notna().to_numpy(dtype=bool)
+    (views, views_ok), (rate, rate_ok), (eng, eng_ok) = (native_values(sub[col]) for col in KPI_COLUMNS[1:])
+    n, views_mean, eng_rate_mean, eng_total_sum = kpi4(has_cat, views, views_ok, rate, rate_ok, eng, eng_ok)
+
+    return {
+        "n": int(n),
+        "views_mean": views_mean,
+        "eng_rate_mean": eng_rate_mean,
+        "eng_total_sum": eng_total_sum,
+    }
+
+def observed_categories(s: pd.Series) -> list:
+    """Categories that actually occur (bincount over the codes, no dropna/unique copies)."""
+    codes = s.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories))
+    return s.cat.categories[counts > 0].tolist()
+
+def filter_options(df: pd.DataFrame) -> dict[str, list]:
+    """Slicer choices for a prepared dataset."""
+    # Slicer columns are categoricals (see dataset.categorize_slicers); absent ones get no choices
+    values = {col: observed_categories(df[col]) if col in df.columns else [] for col in FILTER_COLUMNS}
+    present_days = set(values["Jour de la semaine"])
+    return {
+        "years": sorted(values["Année"]),
+        "cats": sorted(values["cats.name"]),
+        "channels": sorted(values["channel"]),
+        "weekdays": [d for d in WEEKDAYS if d in present_days],
+        "hours": sorted(int(h) for h in values["Heure"]),
+    }
@@ -1,8 +1,17 @@
+import hashlib
+import os
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from datetime import datetime
 
+import analytics
+from analytics import KPI_COLUMNS, filter_mask
+from dataset import SCHEMA_VERSION, prepare_dataset, read_cached, read_dataset
+
 # -----------------------------
 # Page config
 # -----------------------------
@@ -107,13 +116,27 @@ REQUIRED_COLUMNS = [
     "published_at",
 ]
 
+# In-memory cache bounds: base datasets (across all sessions) and filtered subsets
+MAX_DATASETS = 4
+MAX_FILTERED = 32
+
+# Normalized uploads are persisted here as Parquet, keyed by the upload md5 and the
+# dataset schema version; only the most recently used files are kept. Next to
+# app.py, not under the working directory (which may be $HOME, i.e. ~/.cache)
+PARQUET_CACHE_DIR = Path(__file__).parent / ".cache" / "boostme"
+PARQUET_CACHE_MAX_FILES = 16
+# Only files named by load_data ("<upload md5>.v<schema>.parquet") are ever pruned
+_PARQUET_CACHE_GLOB = "[0-9a-f]" * 32 + ".v*.parquet"
+
+# 12,345.67 -> 12 345,67 in a single pass
+_FR_TABLE = str.maketrans({",": " ", ".": ","})
+
 def _fr_int(n: float | int) -> str:
-    """French-ish thousands separator with spaces."""
+    """French-ish thousands separator with spaces (accepts NumPy/Arrow scalars and pd.NA)."""
     if pd.isna(n):
         return "—"
     try:
-        n_int = int(round(float(n)))
-        return f"{n_int:,}".replace(",", " ")
+        return f"{int(round(float(n))):,}".translate(_FR_TABLE)
     except Exception:
         return "—"
 
@@ -121,90 +144,100 @@ def _fr_float(n: float, decimals: int = 2) -> str:
     if pd.isna(n):
         return "—"
     try:
-        fmt = f"{{:,.{decimals}f}}".format(float(n))
-        # 12,345.67 -> 12 345,67
-        fmt = fmt.replace(",", "X").replace(".", ",").replace("X", " ")
-        return fmt
+        return f"{float(n):,.{decimals}f}".translate(_FR_TABLE)
     except Exception:
         return "—"
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+def _hash_upload(uploaded_file) -> str:
     """
-    The PBIX uses some column names with spaces/accents.
-    Here we accept a few common variants and standardize them.
+    md5 of the file bytes (the UploadedFile buffer position mutates). Used both
+    as the cache key and as df_id; memoized on the object so it runs once.
     """
-    rename_map = {
-        "taux_engagement": "Taux d'engagement (%)",
-        "taux d'engagement (%)": "Taux d'engagement (%)",
-        "engagement_total": "Engagement total",
-        "engagement total": "Engagement total",
-        "publishedAt": "published_at",
-        "published_at": "published_at",
-        "date_publication": "published_at",
-        "categorie_id": "category_id",
-        "categoryId": "category_id",
-        "vues": "views",
-        "views": "views",
-        "chaine": "channel",
-        "channel": "channel",
-        "jour de la semaine": "Jour de la semaine",
-        "Jour de la semaine": "Jour de la semaine",
-        "heure": "Heure",
-        "Heure": "Heure",
-        "category_name": "cats.name",
-        "categorie": "cats.name",
-        "cats.name": "cats.name",
-    }
-
-    # Case-insensitive rename
-    lower_to_actual = {c.lower(): c for c in df.columns}
-    final_rename = {}
-    for k, v in rename_map.items():
-        if k in lower_to_actual:
-            final_rename[lower_to_actual[k]] = v
-    df = df.rename(columns=final_rename)
-
-    return df
-
-@st.cache_data(show_spinner=False)
-def load_data(uploaded_file) -> pd.DataFrame:
+    digest = getattr(uploaded_file, "_boostme_md5", None)
+    if digest is None:
+        digest = hashlib.md5(uploaded_file.getvalue()).hexdigest()
+        uploaded_file._boostme_md5 = digest
+    return digest
+
+def _prune_parquet_cache() -> None:
+    """Drop all but the PARQUET_CACHE_MAX_FILES most recently used cache files."""
+    files = sorted(PARQUET_CACHE_DIR.glob(_PARQUET_CACHE_GLOB), key=lambda f: f.stat().st_mtime, reverse=True)
+    for stale in files[PARQUET_CACHE_MAX_FILES:]:
+        stale.unlink(missing_ok=True)
+
+# cache_resource: one shared frame per dataset (no unpickled copy per rerun);
+# nothing downstream mutates it
+@st.cache_resource(
+    show_spinner=False,
+    max_entries=MAX_DATASETS,
+    hash_funcs={"streamlit.runtime.uploaded_file_manager.UploadedFile": _hash_upload},
+)
+def load_data(uploaded_file) -> tuple[str, pd.DataFrame]:
+    """Return (dataset fingerprint, normalized dataframe)."""
     if uploaded_file is None:
-        return pd.DataFrame()
+        return "", pd.DataFrame()
 
-    name = uploaded_file.name.lower()
-    if name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-    elif name.endswith(".parquet"):
-        df = pd.read_parquet(uploaded_file)
+    uploaded_file.seek(0)
+    df_id = _hash_upload(uploaded_file)
+
+    # Already normalized in a previous session (survives server restarts)
+    cache_path = PARQUET_CACHE_DIR / f"{df_id}.v{SCHEMA_VERSION}.parquet"
+    try:
+        df = read_cached(cache_path)
+    except FileNotFoundError:
+        pass  # not cached yet (or pruned by another session)
+    except (OSError, pa.ArrowInvalid):
+        # Truncated / corrupt file: drop it and re-parse the upload
+        try:
+            cache_path.unlink(missing_ok=True)
+        except OSError:
+            pass
     else:
-        raise ValueError("Format non supporté (CSV/Parquet uniquement).")
-
-    df = normalize_columns(df)
-
-    # Parse published_at to datetime (if present)
-    if "published_at" in df.columns:
-        df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce", utc=True).dt.tz_convert(None)
-
-    # Derive Year / Weekday / Hour if missing (PBIX slicers)
-    if "published_at" in df.columns:
-        if "Année" not in df.columns:
-            df["Année"] = df["published_at"].dt.year
-        if "Jour de la semaine" not in df.columns:
-            # French weekday names
-            fr_weekdays = {
-                0: "Lundi", 1: "Mardi", 2: "Mercredi", 3: "Jeudi",
-                4: "Vendredi", 5: "Samedi", 6: "Dimanche"
-            }
-            df["Jour de la semaine"] = df["published_at"].dt.weekday.map(fr_weekdays)
-        if "Heure" not in df.columns:
-            df["Heure"] = df["published_at"].dt.hour
-
-    # Coerce numeric columns
-    for col in ["views", "Taux d'engagement (%)", "Engagement total"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    return df
+        try:
+            cache_path.touch()  # mtime = last use, for _prune_parquet_cache
+        except OSError:
+            pass
+        return df_id, df
+
+    df = prepare_dataset(read_dataset(uploaded_file, uploaded_file.name))
+
+    try:
+        PARQUET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so another session never reads a half-written file
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+        _prune_parquet_cache()
+    except OSError:
+        # Read-only / full disk: the in-memory cache still works
+        pass
+
+    return df_id, df
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_FILTERED)
+def apply_filters(df_id: str, _df: pd.DataFrame, year_sel, cat_sel, ch_sel, day_sel, hour_sel) -> pd.DataFrame:
+    """
+    Cached on (df_id, selections); _df is not hashed. Slicer selections are
+    frozensets so they hash; unchanged combinations return the same frame
+    object instead of re-scanning the dataset.
+    """
+    mask = filter_mask(_df, (year_sel, cat_sel, ch_sel, day_sel, hour_sel))
+    if mask is None:
+        return _df
+    return _df.loc[mask]
+
+@st.cache_data(show_spinner=False, max_entries=MAX_FILTERED)
+def compute_kpis(df_id: str, _fdf: pd.DataFrame, filters: tuple) -> dict:
+    """
+    The 4 PBIX KPIs for a filter set, cached on (df_id, filters). _fdf is the
+    frame apply_filters already returned for those filters (not hashed).
+    """
+    return analytics.kpis(_fdf[KPI_COLUMNS])
+
+@st.cache_data(show_spinner=False, max_entries=MAX_DATASETS)
+def filter_options(df_id: str, _df: pd.DataFrame) -> dict[str, list]:
+    """Slicer choices, computed once per dataset instead of on every rerun."""
+    return analytics.filter_options(_df)
 
 def kpi_card(title: str, value: str, subtitle: str | None = None):
     sub_html = f'<div class="kpi-sub">{subtitle}</div>' if subtitle else '<div class="kpi-sub">&nbsp;</div>'
@@ -225,7 +258,10 @@ def kpi_card(title: str, value: str, subtitle: str | None = None):
 st.sidebar.header("Données")
 uploaded = st.sidebar.file_uploader("Importer le dataset vidéos (CSV/Parquet)", type=["csv", "parquet"])
 
-df = load_data(uploaded)
+df_id, df = load_data(uploaded)
+
+if uploaded is not None and uploaded.name.lower().endswith(".csv"):
+    st.sidebar.caption("Pour de meilleures perfs, convertissez votre CSV en Parquet.")
 
 # -----------------------------
 # Header area (logo + title like PBIX)
@@ -270,44 +306,39 @@ st.markdown(
 
 c1, c2, c3, c4, c5 = st.columns([1, 1, 1, 1, 1])
 
+opts = filter_options(df_id, df)
+
 # Year slicer (published_at year)
-years = sorted([y for y in df.get("Année", pd.Series(dtype=int)).dropna().unique()])
+years = opts["years"]
 with c1:
     year_sel = st.multiselect("Année", years, default=years[-1:] if years else years)
 
 # Category name slicer
-cats = sorted(df.get("cats.name", pd.Series(dtype=str)).dropna().unique())
 with c2:
-    cat_sel = st.multiselect("Catégorie", cats, default=[])
+    cat_sel = st.multiselect("Catégorie", opts["cats"], default=[])
 
 # Channel slicer
-channels = sorted(df.get("channel", pd.Series(dtype=str)).dropna().unique())
 with c3:
-    ch_sel = st.multiselect("Chaîne", channels, default=[])
+    ch_sel = st.multiselect("Chaîne", opts["channels"], default=[])
 
 # Weekday slicer
-weekdays = ["Lundi","Mardi","Mercredi","Jeudi","Vendredi","Samedi","Dimanche"]
-avail_weekdays = [d for d in weekdays if d in set(df.get("Jour de la semaine", pd.Series(dtype=str)).dropna().unique())]
 with c4:
-    day_sel = st.multiselect("Jour", avail_weekdays, default=[])
+    day_sel = st.multiselect("Jour", opts["weekdays"], default=[])
 
 # Hour slicer
-hours = sorted([int(h) for h in df.get("Heure", pd.Series(dtype=float)).dropna().unique() if pd.notna(h)])
 with c5:
-    hour_sel = st.multiselect("Heure", hours, default=[])
-
-fdf = df.copy()
-
-if year_sel and "Année" in fdf.columns:
-    fdf = fdf[fdf["Année"].isin(year_sel)]
-if cat_sel and "cats.name" in fdf.columns:
-    fdf = fdf[fdf["cats.name"].isin(cat_sel)]
-if ch_sel and "channel" in fdf.columns:
-    fdf = fdf[fdf["channel"].isin(ch_sel)]
-if day_sel and "Jour de la semaine" in fdf.columns:
-    fdf = fdf[fdf["Jour de la semaine"].isin(day_sel)]
-if hour_sel and "Heure" in fdf.columns:
-    fdf = fdf[fdf["Heure"].isin(hour_sel)]
+    hour_sel = st.multiselect("Heure", opts["hours"], default=[])
+
+filters = (
+    frozenset(year_sel),
+    frozenset(cat_sel),
+    frozenset(ch_sel),
+    frozenset(day_sel),
+    frozenset(hour_sel),
+)
+# No active slicer: use the base frame as-is, no need for a cache entry
+fdf = df if not any(filters) else apply_filters(df_id, df, *filters)
+kpis = compute_kpis(df_id, fdf, filters)
 
 # -----------------------------
 # KPIs (exactly the 4 cards in the PBIX)
@@ -316,22 +347,22 @@ k1, k2, k3, k4 = st.columns(4)
 
 with k1:
     # Power BI: CountNonNull(videos.category_id)
-    value = _fr_int(fdf["category_id"].notna().sum())
+    value = _fr_int(kpis["n"])
     kpi_card("Nombre total de vidéos analysées", value)
 
 with k2:
     # Power BI: Avg(videos.views)
-    value = _fr_int(fdf["views"].mean())
+    value = _fr_int(kpis["views_mean"])
     kpi_card("Moyenne du nombre de vues par vidéo", value)
 
 with k3:
     # Power BI: Avg(videos.Taux d'engagement (%))
-    value = _fr_float(fdf["Taux d'engagement (%)"].mean(), decimals=2) + " %"
+    value = _fr_float(kpis["eng_rate_mean"], decimals=2) + " %"
     kpi_card("Taux d'engagement moyen", value)
 
 with k4:
     # Power BI: Sum(videos.Engagement total)
-    value = _fr_int(fdf["Engagement total"].sum())
+    value = _fr_int(kpis["eng_total_sum"])
     kpi_card("Nombre total d'intéractions", value)
 
 st.markdown("<br/>", unsafe_allow_html=True)
@@ -340,4 +371,7 @@ st.markdown("<br/>", unsafe_allow_html=True)
 # (Optional) quick debug table
 # -----------------------------
 with st.expander("Voir un aperçu des données filtrées"):
-    st.dataframe(fdf.head(200), use_container_width=True)
+    # The expander body runs even when collapsed: only slice/convert on demand
+    st.checkbox("Afficher l'aperçu (200 lignes)", key="show_preview")
+    if st.session_state.get("show_preview"):
+        st.dataframe(pa.Table.from_pandas(fdf.head(200), preserve_index=False), use_container_width=True)
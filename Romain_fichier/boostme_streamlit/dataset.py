@@ -0,0 +1,171 @@
+"""
+Reading + normalization of the uploaded videos dataset.
+
+Kept out of app.py (which Streamlit re-runs top to bottom on every
+interaction) so it can be imported and tested on its own.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Only the string slicer columns get an explicit Arrow type (dictionary-encoded).
+# Numeric KPI columns are left to inference + pd.to_numeric(errors="coerce"):
+# a strict type would reject "100.0", "-1" or "abc" and fail the whole upload.
+CSV_COLUMN_TYPES = {
+    "channel": pa.dictionary(pa.int32(), pa.string()),
+    "cats.name": pa.dictionary(pa.int32(), pa.string()),
+}
+
+# Bump whenever prepare_dataset's output schema changes: on-disk caches of
+# normalized uploads are keyed on it, so old-schema files are never served
+SCHEMA_VERSION = 1
+
+# Slicer columns, in the same order as the filter tuple passed around in app.py
+FILTER_COLUMNS = ["Année", "cats.name", "channel", "Jour de la semaine", "Heure"]
+
+WEEKDAYS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The PBIX uses some column names with spaces/accents.
+    Here we accept a few common variants and standardize them.
+    """
+    rename_map = {
+        "taux_engagement": "Taux d'engagement (%)",
+        "taux d'engagement (%)": "Taux d'engagement (%)",
+        "engagement_total": "Engagement total",
+        "engagement total": "Engagement total",
+        "publishedAt": "published_at",
+        "published_at": "published_at",
+        "date_publication": "published_at",
+        "categorie_id": "category_id",
+        "categoryId": "category_id",
+        "vues": "views",
+        "views": "views",
+        "chaine": "channel",
+        "channel": "channel",
+        "jour de la semaine": "Jour de la semaine",
+        "Jour de la semaine": "Jour de la semaine",
+        "heure": "Heure",
+        "Heure": "Heure",
+        "category_name": "cats.name",
+        "categorie": "cats.name",
+        "cats.name": "cats.name",
+    }
+
+    # Case-insensitive rename (keys like "publishedAt" are matched lowercased too)
+    rename_map = {k.lower(): v for k, v in rename_map.items()}
+    lower_cols = df.columns.str.lower()
+    mapping = {orig: rename_map[lc] for orig, lc in zip(df.columns, lower_cols) if lc in rename_map}
+    df.rename(columns=mapping, inplace=True)
+
+    return df
+
+def parse_published_at(s: pd.Series) -> pd.Series:
+    """
+    Naive datetime64[ns]. Columns already typed as timestamps (pyarrow.csv
+    infers them, Parquet stores them) are only converted; strings get a
+    single ISO-8601 pass, falling back to the parse-as-UTC-then-strip path
+    for mixed offsets or other formats.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        parsed = s
+    else:
+        try:
+            parsed = pd.to_datetime(s, errors="coerce", format="ISO8601", utc=False)
+        except ValueError:
+            parsed = None
+        if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed) or parsed.isna().all():
+            parsed = pd.to_datetime(s, errors="coerce", utc=True)
+    if parsed.dt.tz is not None:
+        # "...Z" timestamps come back tz-aware: drop the tz, values are already UTC
+        parsed = parsed.dt.tz_convert(None)
+    # Fixed unit, whatever the pandas version infers (and after a Parquet round-trip)
+    return parsed.astype("datetime64[ns]")
+
+def categorize_slicers(df: pd.DataFrame) -> pd.DataFrame:
+    """Slicer columns as categoricals: isin() compares codes, unique() is per-category."""
+    for col in FILTER_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def _pandas_type(arrow_type: pa.DataType):
+    # Dictionaries -> pandas Categorical (dictionary[pyarrow] holding nulls cannot be
+    # cast to category), timestamps -> datetime64 (pyarrow defaults); the rest Arrow-backed
+    if pa.types.is_dictionary(arrow_type) or pa.types.is_timestamp(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+def read_parquet(source) -> pd.DataFrame:
+    """
+    Arrow-backed Parquet read. Categorical columns come back as pandas
+    Categoricals and timestamps as datetime64: pd.read_parquet(dtype_backend="pyarrow")
+    would return dictionary[pyarrow] slicers, which fail astype("category") once they hold nulls.
+    """
+    return pq.read_table(source).to_pandas(types_mapper=_pandas_type)
+
+def read_cached(path) -> pd.DataFrame:
+    """A frame written by prepare_dataset(...).to_parquet(), with the same dtypes as a fresh load."""
+    df = read_parquet(path)
+    if "published_at" in df.columns:
+        df["published_at"] = df["published_at"].astype("datetime64[ns]")
+    return categorize_slicers(df)
+
+def read_csv(buffer) -> pd.DataFrame:
+    """
+    Arrow-backed CSV read; YouTube descriptions contain quoted newlines.
+    Files the Arrow parser rejects (e.g. rows with missing trailing fields)
+    go through the pandas C parser, which loaded them before.
+    """
+    try:
+        table = pacsv.read_csv(
+            buffer,
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            # Empty fields are missing values, as with the pandas parser
+            convert_options=pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES, strings_can_be_null=True),
+        )
+    except pa.ArrowInvalid:
+        buffer.seek(0)
+        return pd.read_csv(buffer, dtype_backend="pyarrow")
+    return table.to_pandas(types_mapper=_pandas_type)
+
+def read_dataset(buffer, name: str) -> pd.DataFrame:
+    """Raw dataframe from a CSV/Parquet buffer, dispatched on the file name."""
+    name = name.lower()
+    if name.endswith(".csv"):
+        return read_csv(buffer)
+    if name.endswith(".parquet"):
+        return read_parquet(buffer)
+    raise ValueError("Format non supporté (CSV/Parquet uniquement).")
+
+def prepare_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalized columns, derived PBIX slicers and narrow numeric KPI columns."""
+    df = normalize_columns(df)
+
+    # Parse published_at to datetime (if present)
+    if "published_at" in df.columns:
+        df["published_at"] = parse_published_at(df["published_at"])
+
+    # Derive Year / Weekday / Hour if missing (PBIX slicers)
+    if "published_at" in df.columns:
+        if "Année" not in df.columns:
+            df["Année"] = df["published_at"].dt.year
+        if "Jour de la semaine" not in df.columns:
+            # French weekday names straight from the weekday codes (NaT -> -1 -> NaN)
+            weekday = df["published_at"].dt.weekday.to_numpy(dtype=np.float64, na_value=np.nan)
+            codes = np.where(np.isnan(weekday), -1, weekday).astype(np.int8)
+            df["Jour de la semaine"] = pd.Categorical.from_codes(codes, categories=WEEKDAYS, ordered=True)
+        if "Heure" not in df.columns:
+            # 0-23 fits in a (nullable, for NaT) int8
+            df["Heure"] = df["published_at"].dt.hour.astype("Int8")
+
+    # Coerce numeric columns, downcast to the narrowest type that holds the values
+    # (counts usually fit uint32, the rate float32: half the bytes per KPI reduction)
+    for col, downcast in [("views", "unsigned"), ("Taux d'engagement (%)", "float"), ("Engagement total", "unsigned")]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce", downcast=downcast, dtype_backend="pyarrow")
+
+    return categorize_slicers(df)
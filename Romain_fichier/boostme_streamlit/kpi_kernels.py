@@ -0,0 +1,59 @@
+"""
+Fused reduction behind the 4 KPI cards.
+
+Lives in its own module: app.py is re-executed on every Streamlit rerun,
+which would rebuild the Numba dispatcher each time. An imported module is
+compiled once per process (and per input dtype signature).
+"""
+import warnings
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional: kpi4 falls back to NumPy reductions
+    njit = None
+
+if njit is not None:
+    # Serial on purpose: the loop is memory-bound, and parallel=True under Streamlit's
+    # per-session threads needs a thread-safe threading layer (TBB hangs at shutdown here)
+    @njit(fastmath={"reassoc", "contract", "nsz", "arcp"}, cache=True)
+    def _kpi4_numba(has_cat, views, views_ok, rate, rate_ok, eng, eng_ok):
+        n = 0
+        s_v = 0.0
+        c_v = 0
+        s_r = 0.0
+        c_r = 0
+        s_e = 0.0
+        for i in range(views.shape[0]):
+            if has_cat[i]:
+                n += 1
+            if views_ok[i]:
+                s_v += views[i]
+                c_v += 1
+            if rate_ok[i]:
+                s_r += rate[i]
+                c_r += 1
+            if eng_ok[i]:
+                s_e += eng[i]
+        views_mean = s_v / c_v if c_v else np.nan
+        rate_mean = s_r / c_r if c_r else np.nan
+        return n, views_mean, rate_mean, s_e
+
+def _kpi4_numpy(has_cat, views, views_ok, rate, rate_ok, eng, eng_ok):
+    with warnings.catch_warnings():
+        # Empty selection -> NaN means, rendered as "—"
+        warnings.simplefilter("ignore", RuntimeWarning)
+        views_mean = views.mean(where=views_ok, dtype=np.float64)
+        rate_mean = rate.mean(where=rate_ok, dtype=np.float64)
+    eng_sum = eng.sum(where=eng_ok, dtype=np.float64)
+    return np.count_nonzero(has_cat), views_mean, rate_mean, eng_sum
+
+def kpi4(has_cat, views, views_ok, rate, rate_ok, eng, eng_ok):
+    """
+    CountNonNull(category_id), Avg(views), Avg(rate), Sum(engagement) in one pass.
+    Value arrays keep their native (narrow) dtype; *_ok are validity masks and
+    accumulation is float64.
+    """
+    kernel = _kpi4_numba if njit is not None else _kpi4_numpy
+    return kernel(has_cat, views, views_ok, rate, rate_ok, eng, eng_ok)
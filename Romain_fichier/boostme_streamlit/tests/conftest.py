@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# app.py / dataset.py live next to this folder and are run as plain scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
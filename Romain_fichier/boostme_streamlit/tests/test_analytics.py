@@ -0,0 +1,117 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+from dataset import FILTER_COLUMNS, prepare_dataset, read_cached, read_dataset
+
+CSV = """category_id,views,Taux d'engagement (%),Engagement total,channel,cats.name,published_at
+10,100,1.5,5,GIMS,Musique,2025-03-03T08:00:00Z
+10,300,2.5,7,GIMS,Musique,2026-02-05T22:02:36Z
+20,50,,3,Squeezie,Humour,2026-02-06T22:30:00Z
+,10,4.0,,,Humour,2026-02-07T08:15:00Z
+24,abc,0.5,1,Squeezie,,pas une date
+"""
+
+# (column, selections): present values, absent values, and a mix
+SELECTIONS = [
+    ("channel", {"GIMS"}),
+    ("channel", {"GIMS", "Squeezie"}),
+    ("channel", {"inconnue"}),
+    ("cats.name", {"Humour"}),
+    ("Année", {2026}),
+    ("Année", {2025, 1999}),
+    ("Jour de la semaine", {"Vendredi", "Samedi"}),
+    ("Heure", {22}),
+    ("Heure", {8, 22}),
+]
+
+
+def _fresh() -> pd.DataFrame:
+    return prepare_dataset(read_dataset(io.BytesIO(CSV.encode()), "videos.csv"))
+
+
+def _restored(tmp_path) -> pd.DataFrame:
+    _fresh().to_parquet(tmp_path / "cache.parquet", compression="zstd")
+    return read_cached(tmp_path / "cache.parquet")
+
+
+def _arrow_categories() -> pd.DataFrame:
+    # Categoricals whose categories are Arrow-typed (int8[pyarrow], string[pyarrow], ...),
+    # as produced by astype("category") on Arrow-backed columns
+    df = _fresh()
+    for col in FILTER_COLUMNS:
+        cat = df[col].cat
+        values = cat.categories.to_numpy()
+        if col == "Heure":
+            arrow_dtype = "int8[pyarrow]"
+        elif col == "Année":
+            arrow_dtype = "int32[pyarrow]"
+            values = values.astype("int32")
+        else:
+            arrow_dtype = "string[pyarrow]"
+        categories = pd.Index(pd.array(values, dtype=arrow_dtype))
+        df[col] = pd.Categorical.from_codes(cat.codes, categories=categories, ordered=cat.ordered)
+    return df
+
+
+@pytest.fixture(params=["fresh", "restored", "arrow-categories"])
+def df(request, tmp_path):
+    if request.param == "fresh":
+        return _fresh()
+    if request.param == "restored":
+        return _restored(tmp_path)
+    return _arrow_categories()
+
+
+def _filters(**by_col) -> tuple:
+    return tuple(frozenset(by_col.get(col, ())) for col in FILTER_COLUMNS)
+
+
+@pytest.mark.parametrize("col,sel", SELECTIONS)
+def test_isin_mask_matches_series_isin(df, col, sel):
+    assert isinstance(df[col].dtype, pd.CategoricalDtype)
+    expected = df[col].astype(object).isin(sel).to_numpy(dtype=bool)
+    np.testing.assert_array_equal(analytics.isin_mask(df[col], sel), expected)
+
+
+def test_missing_values_never_match(df):
+    # Row 4 has no channel / no date, row 5 no category: code -1 must not hit the last category
+    for col in FILTER_COLUMNS:
+        everything = set(analytics.observed_categories(df[col]))
+        np.testing.assert_array_equal(analytics.isin_mask(df[col], everything), df[col].notna().to_numpy())
+
+
+def test_filter_mask_combines_selections(df):
+    assert analytics.filter_mask(df, _filters()) is None
+    mask = analytics.filter_mask(df, _filters(**{"channel": {"GIMS", "Squeezie"}, "Année": {2026}}))
+    expected = df["channel"].astype(object).isin({"GIMS", "Squeezie"}) & df["Année"].astype(object).isin({2026})
+    np.testing.assert_array_equal(mask, expected.to_numpy(dtype=bool))
+
+
+def test_kpis_match_pandas(df):
+    mask = analytics.filter_mask(df, _filters(**{"Année": {2026}}))
+    sub = df.loc[mask, analytics.KPI_COLUMNS]
+    result = analytics.kpis(sub)
+    assert result["n"] == sub["category_id"].notna().sum()
+    assert result["views_mean"] == pytest.approx(sub["views"].mean())
+    assert result["eng_rate_mean"] == pytest.approx(sub["Taux d'engagement (%)"].mean())
+    assert result["eng_total_sum"] == sub["Engagement total"].sum()
+
+
+def test_kpis_empty_selection(df):
+    result = analytics.kpis(df.loc[analytics.filter_mask(df, _filters(channel={"inconnue"})), analytics.KPI_COLUMNS])
+    assert result["n"] == 0
+    assert np.isnan(result["views_mean"]) and np.isnan(result["eng_rate_mean"])
+
+
+def test_filter_options(df):
+    opts = analytics.filter_options(df)
+    assert opts["years"] == [2025, 2026]
+    assert opts["cats"] == ["Humour", "Musique"]
+    assert opts["channels"] == ["GIMS", "Squeezie"]
+    assert opts["weekdays"] == ["Lundi", "Jeudi", "Vendredi", "Samedi"]
+    assert opts["hours"] == [8, 22]
+    assert all(type(h) is int for h in opts["hours"])
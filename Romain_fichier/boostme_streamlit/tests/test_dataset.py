@@ -0,0 +1,116 @@
+import io
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from dataset import FILTER_COLUMNS, parse_published_at, prepare_dataset, read_cached, read_dataset
+
+HEADER = "category_id,views,Taux d'engagement (%),Engagement total,channel,published_at\n"
+DATA_DIR = Path(__file__).resolve().parents[3] / "data"
+
+
+def _load(csv: str) -> pd.DataFrame:
+    return prepare_dataset(read_dataset(io.BytesIO(csv.encode()), "videos.csv"))
+
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        "10,100.0,1.5,5,a,2026-01-01T10:00:00Z",  # float-exported count
+        "10.0,100,1.5,5,a,2026-01-01T10:00:00Z",  # float-exported category_id
+        "10,100,1.5,abc,a,2026-01-01T10:00:00Z",  # garbage count
+        "10,-1,1.5,5,a,2026-01-01T10:00:00Z",  # negative count
+        '10,100,"1,5",5,a,2026-01-01T10:00:00Z',  # French decimal comma
+    ],
+)
+def test_malformed_kpi_cells_load(row):
+    df = _load(HEADER + "10,200,2.5,7,b,2026-01-02T10:00:00Z\n" + row + "\n")
+    assert len(df) == 2
+    for col in ["views", "Taux d'engagement (%)", "Engagement total"]:
+        assert pd.api.types.is_numeric_dtype(df[col])
+
+
+def test_unparseable_cells_become_missing():
+    df = _load(HEADER + "10,200,2.5,7,b,2026-01-02T10:00:00Z\n10,100,1.5,abc,a,2026-01-01T10:00:00Z\n")
+    assert df["Engagement total"].isna().tolist() == [False, True]
+    assert df["views"].tolist() == [200, 100]
+
+
+def test_empty_strings_are_missing():
+    csv = HEADER.rstrip("\n") + ",cats.name\n" + "10,200,2.5,7,,2026-01-02T10:00:00Z,\n10,200,2.5,7,b,2026-01-02T10:00:00Z,Humour\n"
+    df = _load(csv)
+    assert df["channel"].isna().tolist() == [True, False]
+    assert df["cats.name"].isna().tolist() == [True, False]
+    assert "" not in df["channel"].cat.categories
+
+
+def test_quoted_newlines():
+    csv = HEADER.rstrip("\n") + ",title\n" + '10,200,2.5,7,b,2026-01-02T10:00:00Z,"line 1\nline 2"\n'
+    df = _load(csv)
+    assert len(df) == 1
+    assert df["Jour de la semaine"].tolist() == ["Vendredi"]
+    assert df["Heure"].tolist() == [10]
+
+
+def test_short_row_falls_back_to_c_parser():
+    df = _load(HEADER + "10,200,2.5,7,b,2026-01-02T10:00:00Z\n10,100\n")
+    assert len(df) == 2
+    assert df["Engagement total"].isna().tolist() == [False, True]
+
+
+@pytest.mark.parametrize(
+    "path", sorted(DATA_DIR.glob("**/videos.csv")) + sorted(DATA_DIR.glob("new_videos/*.csv")), ids=lambda p: p.name
+)
+def test_repo_sample_videos(path):
+    with open(path, "rb") as f:
+        df = prepare_dataset(read_dataset(f, path.name))
+    assert len(df) > 0
+    assert df["published_at"].notna().any()
+
+
+def test_parquet_cache_round_trip_keeps_dtypes(tmp_path):
+    # Last row: missing channel and date, so every slicer column holds a null
+    fresh = _load(
+        HEADER
+        + "10,200,2.5,7,b,2026-01-02T10:00:00Z\n10,100,1.5,abc,a,2026-01-01T10:00:00Z\n10,100,1.5,5,,pas une date\n"
+    )
+    fresh.to_parquet(tmp_path / "cache.parquet", compression="zstd")
+    back = read_cached(tmp_path / "cache.parquet")
+    assert back["published_at"].dtype == "datetime64[ns]"
+    for col in fresh.columns:
+        if col in FILTER_COLUMNS:
+            assert isinstance(back[col].dtype, pd.CategoricalDtype), col
+            assert back[col].isna().tolist() == fresh[col].isna().tolist(), col
+            assert back[col].dropna().astype(object).tolist() == fresh[col].dropna().astype(object).tolist(), col
+        else:
+            assert back[col].dtype == fresh[col].dtype, col
+    pd.testing.assert_frame_equal(back.drop(columns=FILTER_COLUMNS, errors="ignore"), fresh.drop(columns=FILTER_COLUMNS, errors="ignore"))
+
+
+def test_parquet_upload_with_missing_slicer_values():
+    buffer = io.BytesIO()
+    pd.DataFrame({"channel": pd.Categorical(["a", None]), "views": [1, None]}).to_parquet(buffer)
+    buffer.seek(0)
+    df = prepare_dataset(read_dataset(buffer, "videos.parquet"))
+    assert isinstance(df["channel"].dtype, pd.CategoricalDtype)
+    assert df["channel"].isna().tolist() == [False, True]
+    assert df["views"].isna().tolist() == [False, True]
+
+
+@pytest.mark.parametrize("tz", ["UTC", None])
+def test_parse_published_at_arrow_timestamps(tz):
+    ts_type = pa.timestamp("s", tz=tz)
+    s = pd.Series(pd.array(pa.array([1_770_000_000, None], type=ts_type), dtype=pd.ArrowDtype(ts_type)))
+    parsed = parse_published_at(s)
+    assert parsed.dtype == "datetime64[ns]"
+    assert parsed.tolist()[0] == pd.Timestamp("2026-02-02 02:40:00")
+    assert pd.isna(parsed.iloc[1])
+
+
+def test_parse_published_at_strings():
+    parsed = parse_published_at(pd.Series(["2026-02-05T22:02:36Z", "pas une date"]))
+    assert parsed.dtype == "datetime64[ns]"
+    assert parsed.iloc[0] == pd.Timestamp("2026-02-05 22:02:36")
+    assert pd.isna(parsed.iloc[1])
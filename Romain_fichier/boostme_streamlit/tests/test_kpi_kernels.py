@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import kpi_kernels
+from analytics import native_values
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def kernel(request):
+    if request.param == "numba" and kpi_kernels.njit is None:
+        pytest.skip("numba not installed")
+    return kpi_kernels._kpi4_numba if request.param == "numba" else kpi_kernels._kpi4_numpy
+
+
+def test_matches_pandas_on_narrow_dtypes(kernel):
+    views = pd.Series([4_000_000_000, 10, None, 7], dtype="uint64[pyarrow]")
+    rate = pd.Series([1.5, None, 2.5, 3.0], dtype="float32[pyarrow]")
+    eng = pd.Series([5, 6, None, 4_000_000_000], dtype="uint32[pyarrow]")
+    has_cat = np.array([True, True, False, True])
+
+    def native(s):
+        return s.to_numpy(dtype=s.dtype.numpy_dtype, na_value=0), s.notna().to_numpy()
+
+    n, views_mean, rate_mean, eng_sum = kernel(has_cat, *native(views), *native(rate), *native(eng))
+    assert n == 3
+    assert views_mean == pytest.approx(views.mean())
+    assert rate_mean == pytest.approx(rate.mean())
+    assert eng_sum == eng.sum()
+
+
+def test_arrow_nan_is_not_a_value(kernel):
+    # from_pandas=False keeps NaN as a valid (non-null) double, as Arrow computations produce it
+    rate = pd.Series(pd.arrays.ArrowExtensionArray(pa.array([1.0, float("nan"), 3.0], from_pandas=False)))
+    assert rate.dtype == "double[pyarrow]" and rate.notna().all()
+    has_cat = np.ones(3, dtype=bool)
+
+    n, views_mean, rate_mean, eng_sum = kernel(has_cat, *native_values(rate), *native_values(rate), *native_values(rate))
+    assert n == 3
+    assert views_mean == rate_mean == 2.0
+    assert eng_sum == 4.0
+
+
+def test_empty_selection(kernel):
+    empty_u = np.array([], dtype=np.uint32)
+    empty_f = np.array([], dtype=np.float32)
+    empty_b = np.array([], dtype=bool)
+    n, views_mean, rate_mean, eng_sum = kernel(empty_b, empty_u, empty_b, empty_f, empty_b, empty_u, empty_b)
+    assert n == 0
+    assert np.isnan(views_mean) and np.isnan(rate_mean)
+    assert eng_sum == 0